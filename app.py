@@ -1,3 +1,4 @@
+import os
 import streamlit as st
 import pandas as pd
 import plotly.express as px
@@ -70,6 +71,8 @@ if fetch_btn:
         st.session_state['current_param'] = selected_param_name
         st.session_state['current_station'] = station_id
         st.session_state['current_station_name'] = selected_station_name
+        st.session_state['current_period'] = (start_d, end_d)
+        st.session_state['all_params_csv'] = None
 
 # Now we check if we HAVE data in the state (regardless of button click)
 if st.session_state['data'] is not None and not st.session_state['data'].empty:
@@ -83,9 +86,36 @@ if st.session_state['data'] is not None and not st.session_state['data'].empty:
     # --- 1. PLOTTING ---
     st.subheader(f"Graf: {curr_param}")
     fig = px.line(df, x='Tidspunkt', y='Værdi', title=f"{curr_param} - {curr_stat_name}")
+    
+    # Historiske percentilbånd (10-90%) for årstiden, hvis databasen har dem
+    curr_param_id = dmi_client.PARAMS[curr_param]
+    bands = pd.DataFrame()
+    if os.path.exists("dmi_stats.db"):
+        bands = database.get_percentile_bands(curr_stat_id, curr_param_id, (10, 90))
+    if not bands.empty:
+        doy = df['Tidspunkt'].dt.dayofyear.clip(upper=365)
+        band_df = bands.reindex(doy)
+        fig.add_trace(go.Scatter(
+            x=df['Tidspunkt'], y=band_df['p90'], mode='lines', showlegend=False,
+            line=dict(color='rgba(150, 150, 150, 0.4)', width=0)
+        ))
+        fig.add_trace(go.Scatter(
+            x=df['Tidspunkt'], y=band_df['p10'], mode='lines', name='10-90. percentil',
+            line=dict(color='rgba(150, 150, 150, 0.4)', width=0), fill='tonexty'
+        ))
+        # Læg selve dataserien øverst, så båndet ikke dækker den
+        fig.data = fig.data[1:] + fig.data[:1]
+    
     fig.update_layout(xaxis_title="Tid", yaxis_title=curr_param)
     st.plotly_chart(fig, use_container_width=True)
     
+    valid = df.dropna(subset=['Værdi'])
+    if not bands.empty and not valid.empty:
+        last = valid.iloc[-1]
+        rank = database.get_percentile_rank(curr_stat_id, curr_param_id, last['Tidspunkt'], last['Værdi'])
+        if rank is not None:
+            st.caption(f"Seneste måling ({last['Værdi']}) ligger på **{rank:.0f}. percentil** i forhold til samme tid på året historisk.")
+    
     # --- 2. DOWNLOAD ---
     csv = df.to_csv(index=False).encode('utf-8')
     st.download_button(
@@ -94,12 +124,31 @@ if st.session_state['data'] is not None and not st.session_state['data'].empty:
         file_name=f"dmi_{curr_stat_id}.csv",
         mime="text/csv"
     )
+    
+    # Alle stationens parametre for samme periode, hentet i én gennemgang af API'et
+    if st.button("Hent alle parametre for perioden"):
+        all_param_ids = list(dmi_client.STATION_AVAILABLE_PARAMS.get(curr_stat_id, {}))
+        period_start, period_end = st.session_state['current_period']
+        with st.spinner(f"Henter {len(all_param_ids)} parametre fra {curr_stat_name}..."):
+            frames = dmi_client.fetch_dmi_data_multi(curr_stat_id, all_param_ids, period_start, period_end)
+        non_empty = [f for f in frames.values() if not f.empty]
+        if non_empty:
+            st.session_state['all_params_csv'] = pd.concat(non_empty).to_csv(index=False).encode('utf-8')
+        else:
+            st.warning("Ingen data fundet.")
+    
+    if st.session_state.get('all_params_csv') is not None:
+        st.download_button(
+            label="Download CSV fil (alle parametre)",
+            data=st.session_state['all_params_csv'],
+            file_name=f"dmi_{curr_stat_id}_alle.csv",
+            mime="text/csv"
+        )
 
     # --- 3. FUN FACTS ---
     st.markdown("---")
     st.header("🏆 Rekorder & Statistik (Fra tidligste datapunkt)")
     
-    import os
     if not os.path.exists("dmi_stats.db"):
         st.warning("⚠️ Database ikke fundet.")
     else:
@@ -219,4 +268,75 @@ if st.session_state['data'] is not None and not st.session_state['data'].empty:
                 st.info("Ingen historisk data for denne periode.")
             
 elif fetch_btn: # Only triggers if we clicked button but got no data
-    st.warning("Ingen data fundet.")
\ No newline at end of file
+    st.warning("Ingen data fundet.")
+
+# --- 5. SAMMENLIGN STATIONER ---
+st.markdown("---")
+st.header("🗺️ Sammenlign Stationer")
+st.caption("Hent én parameter for flere stationer på én gang. Målingerne lægges på et fælles tidsgitter, så stationer med forskellige måleintervaller kan sammenlignes direkte.")
+
+compare_names = st.multiselect("Vælg stationer", list(dmi_client.STATIONS.keys()), max_selections=10)
+compare_ids = [dmi_client.STATIONS[n] for n in compare_names]
+
+if compare_ids:
+    # Kun parametre som alle valgte stationer måler
+    common_params = set.intersection(*(set(dmi_client.STATION_AVAILABLE_PARAMS.get(s, {})) for s in compare_ids))
+    compare_display_names = [name for name, dmi_id in dmi_client.PARAMS.items() if dmi_id in common_params]
+    
+    if not compare_display_names:
+        st.warning("De valgte stationer har ingen fælles parametre.")
+    else:
+        cc1, cc2, cc3 = st.columns(3)
+        compare_param_name = cc1.selectbox("Parameter", compare_display_names, key='compare_param_select')
+        compare_param_id = dmi_client.PARAMS[compare_param_name]
+        
+        resolutions = {"10 minutter": "10min", "Time": "1h", "Dag": "1D"}
+        compare_res = cc2.selectbox("Opløsning", list(resolutions.keys()), index=1)
+        
+        aggregations = {"Gennemsnit": "mean", "Minimum": "min", "Maksimum": "max"}
+        compare_agg = cc3.selectbox("Aggregering", list(aggregations.keys()))
+        
+        # Perioden begrænses af den station, der senest begyndte at måle parameteren
+        compare_start_year = max(dmi_client.STATION_AVAILABLE_PARAMS[s][compare_param_id] for s in compare_ids)
+        compare_min_date = datetime(compare_start_year, 1, 1)
+        compare_max_date = datetime.now()
+        
+        cd1, cd2 = st.columns(2)
+        compare_start = cd1.date_input("Startdato", value=compare_max_date - timedelta(days=7),
+                                       min_value=compare_min_date, max_value=compare_max_date, key='compare_start')
+        compare_end = cd2.date_input("Slutdato", value=compare_max_date,
+                                     min_value=compare_min_date, max_value=compare_max_date, key='compare_end')
+        
+        if st.button("Sammenlign"):
+            with st.spinner(f"Henter {compare_param_name} fra {len(compare_ids)} stationer..."):
+                wide = dmi_client.fetch_multi_station(
+                    compare_ids, compare_param_id, compare_start, compare_end,
+                    freq=resolutions[compare_res], how=aggregations[compare_agg]
+                )
+                # Vis stationsnavne i stedet for ID'er
+                wide.columns = [compare_names[compare_ids.index(s)] for s in wide.columns]
+                st.session_state['compare_data'] = wide
+                st.session_state['compare_param'] = compare_param_name
+
+if st.session_state.get('compare_data') is not None:
+    wide = st.session_state['compare_data']
+    if wide.empty:
+        st.warning("Ingen data fundet.")
+    else:
+        fig3 = go.Figure()
+        for name in wide.columns:
+            fig3.add_trace(go.Scattergl(x=wide.index, y=wide[name], mode='lines', name=name, connectgaps=False))
+        fig3.update_layout(
+            title=f"{st.session_state['compare_param']} - sammenligning",
+            xaxis_title="Tid",
+            yaxis_title=st.session_state['compare_param'],
+            hovermode="x unified"
+        )
+        st.plotly_chart(fig3, use_container_width=True)
+        
+        st.download_button(
+            label="Download sammenligning som CSV",
+            data=wide.to_csv().encode('utf-8'),
+            file_name="dmi_sammenligning.csv",
+            mime="text/csv"
+        )
@@ -1,10 +1,16 @@
 import sqlite3
+import numpy as np
 import pandas as pd
 
 # Files
 SOURCE_DB = "dmi_weather.db"  
 TARGET_DB = "dmi_stats.db"    
 
+# Percentile histograms
+HIST_BINS = 200         # Fixed bins per parameter, so histograms can be merged by adding counts
+HIST_TAIL = 0.001       # Share of daily extremes left outside the bin range (bad readings land in the edge bins)
+HIST_PADDING = 0.1      # Extra room on each side of the range, as a share of its span
+
 def create_stats_db():
     conn = sqlite3.connect(TARGET_DB)
     c = conn.cursor()
@@ -24,9 +30,122 @@ def create_stats_db():
             PRIMARY KEY (station_id, parameter_id, date)
         )
     ''')
+    
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS histogram_bins (
+            parameter_id INTEGER PRIMARY KEY,
+            lo REAL,            -- Lower edge of the first bin
+            width REAL,         -- Bin width
+            n_bins INTEGER
+        )
+    ''')
+    
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS doy_histograms (
+            station_id INTEGER,
+            parameter_id INTEGER,
+            doy INTEGER,        -- Day of year 1-365 (no window, that is applied when querying)
+            counts BLOB,        -- Sparse: n uint8 bin indices followed by n little-endian uint32 counts
+            PRIMARY KEY (station_id, parameter_id, doy)
+        )
+    ''')
     conn.commit()
     conn.close()
 
+def get_bin_range(conn, parameter_id):
+    """Robust (lo, width) for a parameter from the daily extremes in daily_stats.
+    The rarest HIST_TAIL of daily minima/maxima is ignored, so a single bad reading can't stretch the bins."""
+    c = conn.cursor()
+    c.execute("SELECT COUNT(*) FROM daily_stats WHERE parameter_id = ?", (parameter_id,))
+    n = c.fetchone()[0]
+    if n == 0:
+        return None
+    skip = int(n * HIST_TAIL)
+    
+    # Exact quantiles via ORDER BY ... OFFSET, so we don't pull the column into pandas
+    c.execute("SELECT min_val FROM daily_stats WHERE parameter_id = ? ORDER BY min_val ASC LIMIT 1 OFFSET ?", (parameter_id, skip))
+    lo = c.fetchone()[0]
+    c.execute("SELECT max_val FROM daily_stats WHERE parameter_id = ? ORDER BY max_val DESC LIMIT 1 OFFSET ?", (parameter_id, skip))
+    hi = c.fetchone()[0]
+    
+    span = hi - lo
+    if span <= 0:
+        return lo - 0.5, 1.0 / HIST_BINS
+    lo -= span * HIST_PADDING
+    return lo, span * (1 + 2 * HIST_PADDING) / HIST_BINS
+
+def encode_counts(bins, counts):
+    return bins.astype(np.uint8).tobytes() + counts.astype('<u4').tobytes()
+
+def write_histograms(target_conn, hist_rows):
+    target_conn.executemany(
+        'INSERT INTO doy_histograms (station_id, parameter_id, doy, counts) VALUES (?, ?, ?, ?)', hist_rows)
+    target_conn.commit()
+
+def build_doy_histograms(source_conn, target_conn):
+    """Builds one fixed-bin histogram per station/parameter/day-of-year, used for percentile lookups."""
+    print("  Building day-of-year histograms...")
+    
+    # 1. Bin ranges for all parameters first (from the small daily_stats table)
+    bin_rows = []
+    for (parameter_id,) in target_conn.execute("SELECT DISTINCT parameter_id FROM daily_stats").fetchall():
+        bin_range = get_bin_range(target_conn, parameter_id)
+        if bin_range is not None:
+            lo, width = bin_range
+            bin_rows.append((parameter_id, lo, width, HIST_BINS))
+    
+    target_conn.execute("DELETE FROM histogram_bins")
+    target_conn.execute("DELETE FROM doy_histograms")
+    target_conn.executemany('INSERT INTO histogram_bins (parameter_id, lo, width, n_bins) VALUES (?, ?, ?, ?)', bin_rows)
+    target_conn.commit()
+    
+    # 2. One pass over observations for all parameters. The ranges go in a temp table on the
+    #    source connection, so the join doesn't lock the target database we are writing to.
+    source_conn.execute('CREATE TEMP TABLE hist_bins (parameter_id INTEGER PRIMARY KEY, lo REAL, width REAL, n_bins INTEGER)')
+    source_conn.executemany('INSERT INTO hist_bins VALUES (?, ?, ?, ?)', bin_rows)
+    
+    # SQLite does the binning, so we only pull counts and never the raw rows.
+    # Values outside the range are clamped into the edge bins, and day 366 (leap years) into day 365.
+    cursor = source_conn.execute("""
+        SELECT
+            o.parameter_id,
+            o.station_id,
+            MIN(CAST(strftime('%j', o.observed_at) AS INTEGER), 365) as doy,
+            MAX(MIN(CAST((o.value - b.lo) / b.width AS INTEGER), b.n_bins - 1), 0) as bin,
+            COUNT(*) as n
+        FROM observations o
+        JOIN hist_bins b ON o.parameter_id = b.parameter_id
+        GROUP BY o.parameter_id, o.station_id, doy, bin
+        ORDER BY o.parameter_id, o.station_id, doy, bin
+    """)
+    
+    # Rows arrive sorted, so each histogram is complete when the key changes,
+    # and each parameter is written as soon as the next one starts.
+    hist_rows = []
+    total = 0
+    key = None
+    bins, counts = [], []
+    for parameter_id, station_id, doy, bin_idx, n in cursor:
+        if (parameter_id, station_id, doy) != key:
+            if key is not None:
+                hist_rows.append((key[1], key[0], key[2], encode_counts(np.array(bins), np.array(counts))))
+                if parameter_id != key[0]:
+                    write_histograms(target_conn, hist_rows)
+                    total += len(hist_rows)
+                    hist_rows = []
+            key = (parameter_id, station_id, doy)
+            bins, counts = [], []
+        bins.append(bin_idx)
+        counts.append(n)
+    
+    if key is not None:
+        hist_rows.append((key[1], key[0], key[2], encode_counts(np.array(bins), np.array(counts))))
+    write_histograms(target_conn, hist_rows)
+    total += len(hist_rows)
+    
+    print(f"  Wrote {total} histograms to {TARGET_DB}.")
+    target_conn.execute("CREATE INDEX IF NOT EXISTS idx_hist_lookup ON doy_histograms (station_id, parameter_id, doy)")
+
 def aggregate_data():
     source_conn = sqlite3.connect(SOURCE_DB)
     target_conn = sqlite3.connect(TARGET_DB)
@@ -63,6 +182,8 @@ def aggregate_data():
     # Create an index for speed
     target_conn.execute("CREATE INDEX IF NOT EXISTS idx_date ON daily_stats (date)")
     
+    build_doy_histograms(source_conn, target_conn)
+    
     source_conn.close()
     target_conn.close()
     print("Done! 'dmi_stats.db' is ready for deployment.")
@@ -1,3 +1,4 @@
+import csv
 import sqlite3
 import requests
 import time
@@ -21,6 +22,19 @@ PARAMS = {
     # "precip_past10min": "Nedbør 10 min"
 }
 
+def load_start_years():
+    """Returns {'06180': {'temp_dry': 1953, ...}, ...} from the station overview CSV."""
+    start_years = {}
+    with open("DMI stations.csv", encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            start_years[row['StationId']] = {
+                col: int(val) for col, val in row.items()
+                if col not in ('StationId', 'StationName') and val and val != '-'
+            }
+    return start_years
+
+START_YEARS = load_start_years()
+
 def init_db():
     conn = sqlite3.connect(DB_NAME)
     c = conn.cursor()
@@ -46,6 +60,16 @@ def init_db():
     c.execute('CREATE INDEX IF NOT EXISTS idx_obs_lookup ON observations (station_id, parameter_id, observed_at)')
     c.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_unique_obs ON observations (station_id, parameter_id, observed_at)')
     
+    # Marks station/parameter/years whose fetch ran to the end, so sparse or empty years aren't fetched again
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS fetched_years (
+            station_id INTEGER,
+            parameter_id INTEGER,
+            year INTEGER,
+            PRIMARY KEY (station_id, parameter_id, year)
+        )
+    ''')
+    
     # 4. Populate Lookup Tables (Idempotent: "INSERT OR IGNORE")
     for dmi_id, name in STATIONS.items():
         c.execute('INSERT OR IGNORE INTO stations (dmi_id, name) VALUES (?, ?)', (dmi_id, name))
@@ -72,14 +96,13 @@ def get_lookup_ids():
     conn.close()
     return station_map, param_map
 
-def fetch_year(station_dmi_id, param_dmi_id, year, s_map, p_map):
-    # Convert string IDs to Integer IDs
-    s_id_int = s_map[station_dmi_id]
-    p_id_int = p_map[param_dmi_id]
+def is_year_complete(c, station_dmi_id, s_id_int, p_id_int, year):
+    c.execute('''
+        SELECT 1 FROM fetched_years WHERE station_id = ? AND parameter_id = ? AND year = ?
+    ''', (s_id_int, p_id_int, year))
+    if c.fetchone():
+        return True
     
-    # Check if year is already done
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
     start_str = f"{year}-01-01"
     end_str = f"{year}-12-31"
     
@@ -98,8 +121,7 @@ def fetch_year(station_dmi_id, param_dmi_id, year, s_map, p_map):
     # Alternativt kunne vi tjekke på > 330 unikke dage med `substr(observed_at, 1, 10)`.
     if not is_current_year and unique_months == 12:
         print(f"  [SKIP] {station_dmi_id} {year}: Complete (12 months present).")
-        conn.close()
-        return
+        return True
     elif not is_current_year and unique_months > 0:
         # Hvis en station er startet midt i et år (f.eks. Bornholm 1959), vil den have < 12 måneder.
         # For at vi ikke bliver ved med at hente det samme "ufærdige" år hver gang,
@@ -115,11 +137,37 @@ def fetch_year(station_dmi_id, param_dmi_id, year, s_map, p_map):
         # kan vi også tillade at springe over for ikke at spilde tid på gamle år, der oprigtigt mangler måneder.
         if unique_days > 200:
             print(f"  [SKIP] {station_dmi_id} {year}: Assuming complete (Started mid-year? {unique_days} days present).")
-            conn.close()
-            return
+            return True
+
+    return False
+
+def fetch_year(station_dmi_id, param_dmi_id, year, s_map, p_map):
+    fetch_station_year(station_dmi_id, [param_dmi_id], year, s_map, p_map)
 
+def fetch_station_year(station_dmi_id, param_dmi_ids, year, s_map, p_map):
+    """Fetches all wanted parameters for one station/year in a single paged sweep
+    (no parameterId filter) and splits the rows per parameter on insert.
+    Parameters the station didn't measure that year (see 'DMI stations.csv') are left out."""
+    s_id_int = s_map[station_dmi_id]
+    
+    # Only fetch the parameters the station measured this year and that are not already complete
+    station_start_years = START_YEARS.get(station_dmi_id)
+    conn = sqlite3.connect(DB_NAME)
+    c = conn.cursor()
+    wanted = {}
+    for param_dmi_id in param_dmi_ids:
+        if station_start_years is not None:
+            start_year = station_start_years.get(param_dmi_id)
+            if start_year is None or year < start_year:
+                continue
+        p_id_int = p_map[param_dmi_id]
+        if not is_year_complete(c, station_dmi_id, s_id_int, p_id_int, year):
+            wanted[param_dmi_id] = p_id_int
     conn.close()
-    print(f"  [FETCH] {station_dmi_id} {param_dmi_id} {year}...")
+    
+    if not wanted: return
+    label = next(iter(wanted)) if len(wanted) == 1 else f"{len(wanted)} params"
+    print(f"  [FETCH] {station_dmi_id} {label} {year}...")
     
     # API Request Setup
     start_date = datetime(year, 1, 1)
@@ -132,17 +180,20 @@ def fetch_year(station_dmi_id, param_dmi_id, year, s_map, p_map):
     time_str = f"{start_str}T00:00:00Z/{end_str}T23:59:59Z"
     
     params = {
-        'parameterId': param_dmi_id,
         'stationId': station_dmi_id,
         'datetime': time_str,
         'limit': 300000, 
         'api-key': ''
     }
+    # A single missing parameter is cheaper to fetch with the API-side filter
+    if len(wanted) == 1:
+        params['parameterId'] = next(iter(wanted))
     
     conn = sqlite3.connect(DB_NAME)
     c = conn.cursor()
     offset = 0
     total_inserted = 0
+    finished = False
 
     while True:
         params['offset'] = offset
@@ -152,12 +203,15 @@ def fetch_year(station_dmi_id, param_dmi_id, year, s_map, p_map):
             data = r.json()
             features = data.get('features', [])
             
-            if not features: break
+            if not features:
+                finished = True
+                break
             
             rows_to_insert = []
             for f in features:
                 p = f['properties']
-                if p['value'] is not None:
+                p_id_int = wanted.get(p['parameterId'])
+                if p_id_int is not None and p['value'] is not None:
                     rows_to_insert.append((
                         s_id_int, 
                         p_id_int, 
@@ -174,16 +228,25 @@ def fetch_year(station_dmi_id, param_dmi_id, year, s_map, p_map):
                 conn.commit()
             
             total_inserted += len(rows_to_insert)
-            # Minimal logging to keep terminal clean
             if offset % 10000 == 0:
                 print(f"    {year}: Inserted {total_inserted} rows...")
             
-            if len(features) < 1000: break
+            if len(features) < 1000:
+                finished = True
+                break
             offset += len(features)
             
         except Exception as e:
             print(f"    Error: {e}")
             break
+    
+    # A finished past year won't get new data, so don't ask for it again (even if it was empty)
+    if finished and year < datetime.now().year:
+        c.executemany(
+            'INSERT OR IGNORE INTO fetched_years (station_id, parameter_id, year) VALUES (?, ?, ?)',
+            [(s_id_int, p_id_int, year) for p_id_int in wanted.values()]
+        )
+        conn.commit()
             
     conn.close()
 
@@ -194,7 +257,7 @@ if __name__ == "__main__":
     
     current_year = datetime.now().year
     
+    # One sweep per station/year covers every parameter in PARAMS
     for station_dmi_id in STATIONS.keys():
-        for param_dmi_id in PARAMS.keys():
-            for year in range(1959, current_year + 1):
-                fetch_year(station_dmi_id, param_dmi_id, year, station_map, param_map)
\ No newline at end of file
+        for year in range(1959, current_year + 1):
+            fetch_station_year(station_dmi_id, list(PARAMS.keys()), year, station_map, param_map)
\ No newline at end of file
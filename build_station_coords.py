@@ -0,0 +1,50 @@
+import csv
+import requests
+
+# --- Configuration ---
+STATION_API = "https://opendataapi.dmi.dk/v2/metObs/collections/station/items"
+STATIONS_CSV = "DMI stations.csv"
+COORDS_CSV = "DMI station coordinates.csv"
+
+def fetch_station_coords():
+    """Returns {'06180': (lat, lon), ...} for the stations DMI knows about."""
+    r = requests.get(STATION_API, params={'limit': 10000, 'api-key': ''})
+    r.raise_for_status()
+    features = r.json().get('features', [])
+    
+    # A station can have several metadata versions (moved, re-equipped...).
+    # We keep the newest one, since that is where it measures today.
+    latest = {}
+    for f in features:
+        p = f['properties']
+        coords = (f.get('geometry') or {}).get('coordinates')
+        if not coords:
+            continue
+        stat_id = p['stationId']
+        valid_from = p.get('validFrom') or ''
+        if stat_id not in latest or valid_from > latest[stat_id][0]:
+            lon, lat = coords[0], coords[1]
+            latest[stat_id] = (valid_from, lat, lon)
+            
+    return {stat_id: (lat, lon) for stat_id, (_, lat, lon) in latest.items()}
+
+if __name__ == "__main__":
+    with open(STATIONS_CSV, encoding='utf-8') as f:
+        station_ids = [row['StationId'] for row in csv.DictReader(f)]
+    
+    print("Fetching station metadata...")
+    coords = fetch_station_coords()
+    
+    missing = [s for s in station_ids if s not in coords]
+    if missing:
+        print(f"  No coordinates for: {', '.join(missing)}")
+    
+    with open(COORDS_CSV, 'w', newline='', encoding='utf-8') as f:
+        w = csv.writer(f, lineterminator='\n')
+        w.writerow(['StationId', 'Latitude', 'Longitude'])
+        for stat_id in station_ids:
+            if stat_id in coords:
+                lat, lon = coords[stat_id]
+                w.writerow([stat_id, lat, lon])
+                
+    print(f"Done! Wrote {len(station_ids) - len(missing)} stations to '{COORDS_CSV}'.")
@@ -1,8 +1,12 @@
 import sqlite3
+import numpy as np
 import pandas as pd
 
 DB_FILE = "dmi_stats.db"
 
+# Dag-på-året histogrammer dækker +/- så mange dage omkring dagen
+HIST_WINDOW = 7
+
 def get_station_extremes(station_dmi_id):
     conn = sqlite3.connect(DB_FILE)
     records = {}
@@ -98,3 +102,108 @@ def get_period_stats_per_year(station_dmi_id, param_dmi_id, start_md, end_md):
         
     conn.close()
     return df
+
+def _day_of_year(date):
+    # Histogrammerne har 365 dage; skuddagens dag 366 er lagt sammen med dag 365
+    return min(pd.Timestamp(date).dayofyear, 365)
+
+def _decode_counts(blob, n_bins):
+    # Sparse format fra build_daily_stats: n bin-indekser (uint8) efterfulgt af n tællinger (uint32)
+    n = len(blob) // 5
+    bins = np.frombuffer(blob, dtype=np.uint8, count=n)
+    counts = np.frombuffer(blob, dtype='<u4', offset=n)
+    dense = np.zeros(n_bins, dtype=np.float64)
+    dense[bins] = counts
+    return dense
+
+def _load_histograms(station_dmi_id, param_dmi_id, doy=None):
+    """
+    Henter dag-på-året histogrammer for station/parameter (én dag, eller alle hvis doy er None),
+    summeret over +/- HIST_WINDOW dage omkring hver dag.
+    Returnerer (doys, lo, width, counts-matrix) eller None.
+    """
+    conn = sqlite3.connect(DB_FILE)
+    query = """
+        SELECT h.doy, h.counts, b.lo, b.width, b.n_bins
+        FROM doy_histograms h
+        JOIN histogram_bins b ON h.parameter_id = b.parameter_id
+        JOIN stations st ON h.station_id = st.id
+        JOIN parameters p ON h.parameter_id = p.id
+        WHERE st.dmi_id = ?
+        AND p.dmi_id = ?
+    """
+    params = [station_dmi_id, param_dmi_id]
+    if doy is not None:
+        # Kun de dage vinduet omkring doy har brug for (hen over nytår)
+        window_doys = [(doy - 1 + shift) % 365 + 1 for shift in range(-HIST_WINDOW, HIST_WINDOW + 1)]
+        query += f" AND h.doy IN ({', '.join('?' * len(window_doys))})"
+        params += window_doys
+    
+    result = None
+    try:
+        df = pd.read_sql(query, conn, params=params)
+        if not df.empty:
+            lo, width, n_bins = df['lo'].iloc[0], df['width'].iloc[0], int(df['n_bins'].iloc[0])
+            daily = np.zeros((365, n_bins), dtype=np.float64)
+            for d, blob in zip(df['doy'], df['counts']):
+                daily[d - 1] = _decode_counts(blob, n_bins)
+            
+            # Glidende vindue over året: summen af naboerne er stadig et gyldigt histogram
+            windowed = sum(np.roll(daily, shift, axis=0) for shift in range(-HIST_WINDOW, HIST_WINDOW + 1))
+            doys = np.arange(1, 366) if doy is None else np.array([doy])
+            result = (doys, lo, width, windowed[doys - 1])
+    except:
+        pass
+        
+    conn.close()
+    return result
+
+def _histogram_quantiles(lo, width, counts, percentiles):
+    # counts: (dage, bins). Lineær interpolation inden for den bin, hvor percentilen falder.
+    cum = np.cumsum(counts, axis=1)
+    total = cum[:, -1:]
+    out = {}
+    for q in percentiles:
+        target = total * (q / 100)
+        idx = np.minimum((cum < target).sum(axis=1), counts.shape[1] - 1)
+        rows = np.arange(counts.shape[0])
+        below = np.where(idx > 0, cum[rows, idx - 1], 0)
+        in_bin = counts[rows, idx]
+        frac = np.divide(target[:, 0] - below, in_bin, out=np.zeros_like(below, dtype=np.float64), where=in_bin > 0)
+        values = lo + (idx + frac) * width
+        out[q] = np.where(total[:, 0] > 0, values, np.nan)
+    return out
+
+def get_percentile_bands(station_dmi_id, param_dmi_id, percentiles=(10, 50, 90)):
+    """
+    Percentilbånd for hver dag på året ud fra historikken.
+    Returnerer DataFrame indekseret på 'doy' (1-365) med én kolonne pr. percentil, f.eks. 'p10'.
+    """
+    hist = _load_histograms(station_dmi_id, param_dmi_id)
+    if hist is None:
+        return pd.DataFrame()
+    doys, lo, width, counts = hist
+    
+    bands = _histogram_quantiles(lo, width, counts, percentiles)
+    return pd.DataFrame({f"p{q}": v for q, v in bands.items()}, index=pd.Index(doys, name='doy'))
+
+def get_percentile_rank(station_dmi_id, param_dmi_id, date, value):
+    """
+    Hvor usædvanlig er en værdi for årstiden? Returnerer andelen (0-100) af historiske
+    målinger omkring samme dag på året, der ligger under værdien, eller None.
+    Målingerne i værdiens egen bin tæller som halvt under (mid-rank), så mange ens
+    værdier (f.eks. 0 mm nedbør) ikke får en tilfældig rang alt efter hvor i bin'en de falder.
+    """
+    hist = _load_histograms(station_dmi_id, param_dmi_id, _day_of_year(date))
+    if hist is None:
+        return None
+    _, lo, width, counts = hist
+    counts = counts[0]
+    total = counts.sum()
+    if total == 0:
+        return None
+    
+    # Samme afklipning til yderste bins som da histogrammerne blev bygget
+    i = min(max(int(np.floor((value - lo) / width)), 0), len(counts) - 1)
+    below = counts[:i].sum() + counts[i] / 2
+    return float(100 * below / total)
@@ -1,6 +1,8 @@
 import requests
+import numpy as np
 import pandas as pd
 import streamlit as st 
+from concurrent.futures import ThreadPoolExecutor
 
 API_BASE = "https://opendataapi.dmi.dk/v2/metObs/collections/observation/items"
 
@@ -49,6 +51,40 @@ for _, row in _station_data.iterrows():
             p_dict[col] = int(val)
     STATION_AVAILABLE_PARAMS[stat_id] = p_dict
 
+# Station -> (breddegrad, længdegrad), lagt i repoet så appen kan køre offline.
+# Positionerne er tilnærmede (~1-2 km); build_station_coords.py henter DMI's præcise.
+_coord_data = pd.read_csv("DMI station coordinates.csv", dtype={'StationId': str})
+STATION_COORDS = dict(zip(_coord_data['StationId'], zip(_coord_data['Latitude'], _coord_data['Longitude'])))
+
+def _iter_feature_pages(params, status_text=None):
+    # Gennemgår alle sider for de givne query-parametre og giver én side features ad gangen.
+    # status_text er valgfri, da Streamlit-elementer ikke kan opdateres fra baggrundstråde.
+    offset = 0
+    
+    while True:
+        # Opdater offset for at hente næste side
+        params['offset'] = offset
+        
+        if status_text is not None:
+            status_text.text(f"Henter data... (Række {offset} fundet indtil videre)")
+        
+        response = requests.get(API_BASE, params=params)
+        response.raise_for_status()
+        data = response.json()
+        
+        features = data.get('features', [])
+        yield features
+        
+        # Hvis vi fik færre end 1000 rækker, er vi færdige
+        if len(features) < 1000:
+            break
+        
+        # Ellers gør klar til næste side
+        offset += 1000
+
+def _fetch_all_features(params, status_text=None):
+    return [f for page in _iter_feature_pages(params, status_text) for f in page]
+
 def fetch_dmi_data(station_id, param_id, start_date, end_date):
     # Formater datoer til RFC3339
     time_str = f"{start_date.isoformat()}T00:00:00Z/{end_date.isoformat()}T23:59:59Z"
@@ -62,32 +98,11 @@ def fetch_dmi_data(station_id, param_id, start_date, end_date):
         'api-key': ''   
     }
     
-    all_features = []
-    offset = 0
-    
     # Statusbesked
     status_text = st.empty()
     
     try:
-        while True:
-            # Opdater offset for at hente næste side
-            params['offset'] = offset
-            
-            status_text.text(f"Henter data... (Række {offset} fundet indtil videre)")
-            
-            response = requests.get(API_BASE, params=params)
-            response.raise_for_status()
-            data = response.json()
-            
-            features = data.get('features', [])
-            all_features.extend(features)
-            
-            # Hvis vi fik færre end 1000 rækker, er vi færdige
-            if len(features) < 1000:
-                break
-            
-            # Ellers gør klar til næste side
-            offset += 1000
+        all_features = _fetch_all_features(params, status_text)
             
         # Ryd statusbesked når færdig
         status_text.empty()
@@ -112,4 +127,134 @@ def fetch_dmi_data(station_id, param_id, start_date, end_date):
 
     except Exception as e:
         st.error(f"Fejl ved hentning af data: {e}")
-        return pd.DataFrame()
\ No newline at end of file
+        return pd.DataFrame()
+
+def fetch_dmi_data_multi(station_id, param_ids, start_date, end_date):
+    """
+    Henter flere parametre for en station i én samlet gennemgang af API'ets sider
+    (uden parameterId-filter) og fordeler observationerne pr. parameter.
+    Returnerer {param_id: DataFrame} med samme kolonner som fetch_dmi_data.
+    """
+    param_ids = list(dict.fromkeys(param_ids))
+    if len(param_ids) == 1:
+        # Én parameter: filtrér direkte i API'et i stedet for at hente hele stationen
+        return {param_ids[0]: fetch_dmi_data(station_id, param_ids[0], start_date, end_date)}
+
+    time_str = f"{start_date.isoformat()}T00:00:00Z/{end_date.isoformat()}T23:59:59Z"
+    
+    params = {
+        'stationId': station_id,
+        'datetime': time_str,
+        'limit': 1000, 
+        'api-key': ''   
+    }
+    
+    status_text = st.empty()
+    
+    try:
+        # Kolonnevis opsamling pr. parameter: param_id -> (tidspunkter, værdier).
+        # Fordeles side for side, så de rå features for hele stationen aldrig ligger i hukommelsen på én gang.
+        columns = {p: ([], []) for p in param_ids}
+        for page in _iter_feature_pages(params, status_text):
+            for f in page:
+                props = f['properties']
+                col = columns.get(props['parameterId'])
+                if col is None:
+                    continue # Parameter som ikke er bedt om
+                col[0].append(props['observed'])
+                col[1].append(props['value'])
+        status_text.empty()
+
+        result = {}
+        for p, (times, values) in columns.items():
+            if not times:
+                result[p] = pd.DataFrame()
+                continue
+            df = pd.DataFrame({
+                'Tidspunkt': pd.to_datetime(times),
+                'Parameter': p,
+                'Værdi': values,
+                'Station': station_id
+            })
+            result[p] = df.sort_values('Tidspunkt')
+        return result
+
+    except Exception as e:
+        st.error(f"Fejl ved hentning af data: {e}")
+        return {p: pd.DataFrame() for p in param_ids}
+
+def _fetch_station_values(station_id, param_id, time_str):
+    # Køres i en baggrundstråd: ingen Streamlit-kald her, kun rå tidspunkter og værdier
+    params = {
+        'parameterId': param_id,
+        'stationId': station_id,
+        'datetime': time_str,
+        'limit': 1000, 
+        'api-key': ''   
+    }
+    # Side for side, så kun tidspunkter og værdier gemmes og ikke de rå features
+    times = []
+    values = []
+    for page in _iter_feature_pages(params):
+        for f in page:
+            props = f['properties']
+            times.append(props['observed'])
+            values.append(props['value'])
+    return times, values
+
+def fetch_multi_station(station_ids, param_id, start_date, end_date, freq='1h', how='mean', max_workers=8):
+    """
+    Henter én parameter for flere stationer samtidigt og lægger dem på et fælles tidsgitter.
+    Stationerne rapporterer med forskellige intervaller, så hver måling placeres i sin
+    tidsspand (freq, f.eks. '10min', '1h', '1D') og aggregeres med how ('mean', 'min' eller 'max').
+    Returnerer en bred DataFrame: indeks 'Tidspunkt', én kolonne pr. station ID.
+    """
+    time_str = f"{start_date.isoformat()}T00:00:00Z/{end_date.isoformat()}T23:59:59Z"
+    
+    status_text = st.empty()
+    status_text.text(f"Henter data fra {len(station_ids)} stationer...")
+    
+    results = {}
+    errors = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {s: pool.submit(_fetch_station_values, s, param_id, time_str) for s in station_ids}
+        for station_id, future in futures.items():
+            try:
+                results[station_id] = future.result()
+            except Exception as e:
+                errors.append(f"{station_id}: {e}")
+    
+    status_text.empty()
+    if errors:
+        st.error("Fejl ved hentning af data: " + "; ".join(errors))
+    
+    # Saml alle stationer i én lang tabel, så spandene beregnes i én vektoriseret groupby
+    n_obs = [len(results[s][0]) for s in results]
+    if sum(n_obs) == 0:
+        return pd.DataFrame()
+    
+    times = pd.to_datetime(np.concatenate([results[s][0] for s in results]))
+    values = np.concatenate([np.asarray(results[s][1], dtype=np.float64) for s in results])
+    stations = pd.Categorical(np.repeat(list(results), n_obs), categories=list(station_ids))
+    
+    long_df = pd.DataFrame({
+        'Tidspunkt': times.floor(freq),
+        'Station': stations,
+        'Værdi': values
+    })
+    wide = (
+        long_df.groupby(['Tidspunkt', 'Station'], observed=False)['Værdi']
+        .agg(how)
+        .unstack('Station')
+    )
+    
+    # Fælles gitter for hele perioden, så huller står som NaN i stedet for at forsvinde
+    grid = pd.date_range(
+        pd.Timestamp(start_date, tz='UTC').floor(freq),
+        pd.Timestamp(end_date, tz='UTC') + pd.Timedelta(days=1),
+        freq=freq, inclusive='left', name='Tidspunkt'
+    )
+    wide = wide.reindex(grid).astype(np.float32)
+    wide.columns = wide.columns.astype(str)
+    wide.columns.name = None
+    return wide
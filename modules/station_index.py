@@ -0,0 +1,89 @@
+import math
+import heapq
+from bisect import bisect_left, bisect_right
+
+from modules import dmi_client
+
+EARTH_RADIUS_KM = 6371.0
+
+def _to_xyz(lat, lon):
+    # Punkt på enhedskuglen. Den lige afstand (korden) mellem to punkter vokser
+    # monotont med storcirkel-afstanden, så et almindeligt KD-træ giver korrekte naboer.
+    lat_r, lon_r = math.radians(lat), math.radians(lon)
+    return (math.cos(lat_r) * math.cos(lon_r), math.cos(lat_r) * math.sin(lon_r), math.sin(lat_r))
+
+def _chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+def _build_kdtree(items, depth=0):
+    # items: [(xyz, station_id)]. Node: (xyz, station_id, akse, venstre, højre)
+    if not items:
+        return None
+    axis = depth % 3
+    items.sort(key=lambda it: it[0][axis])
+    mid = len(items) // 2
+    return (
+        items[mid][0], items[mid][1], axis,
+        _build_kdtree(items[:mid], depth + 1),
+        _build_kdtree(items[mid + 1:], depth + 1)
+    )
+
+def _has_param(station_id, param_id, since_year):
+    if param_id is None:
+        return True
+    start_year = dmi_client.STATION_AVAILABLE_PARAMS.get(station_id, {}).get(param_id)
+    if start_year is None:
+        return False
+    return since_year is None or start_year <= since_year
+
+# Indekset bygges én gang ved import, ligesom STATIONS og STATION_AVAILABLE_PARAMS
+_TREE = _build_kdtree([(_to_xyz(lat, lon), s) for s, (lat, lon) in dmi_client.STATION_COORDS.items()])
+
+# Sorteret på breddegrad til bounding-box opslag
+_BY_LAT = sorted((lat, lon, s) for s, (lat, lon) in dmi_client.STATION_COORDS.items())
+_LATS = [lat for lat, _, _ in _BY_LAT]
+
+def nearest_stations(lat, lon, k=1, param_id=None, since_year=None):
+    """
+    Finder de k nærmeste stationer til (lat, lon).
+    Med param_id medtages kun stationer der måler parameteren, og med since_year
+    kun dem der har gjort det siden (mindst) det år.
+    Returnerer [(station_id, afstand_km), ...] sorteret efter afstand.
+    """
+    target = _to_xyz(lat, lon)
+    best = []  # max-heap via negative afstande: (-dist2, station_id)
+
+    def visit(node):
+        if node is None:
+            return
+        point, station_id, axis, left, right = node
+        diff = target[axis] - point[axis]
+
+        if _has_param(station_id, param_id, since_year):
+            dist2 = sum((a - b) ** 2 for a, b in zip(target, point))
+            if len(best) < k:
+                heapq.heappush(best, (-dist2, station_id))
+            elif dist2 < -best[0][0]:
+                heapq.heapreplace(best, (-dist2, station_id))
+
+        near, far = (left, right) if diff < 0 else (right, left)
+        visit(near)
+        # Den anden side kan kun indeholde noget bedre hvis delingsplanet er tættere end den værste kandidat
+        if len(best) < k or diff * diff < -best[0][0]:
+            visit(far)
+
+    if k > 0:
+        visit(_TREE)
+    return [(s, _chord_to_km(math.sqrt(-d2))) for d2, s in sorted(best, reverse=True)]
+
+def stations_in_bbox(min_lat, min_lon, max_lat, max_lon, param_id=None, since_year=None):
+    """
+    Returnerer station ID'er inden for et kortudsnit (f.eks. det synlige område på et kort),
+    evt. filtreret på parameter og startår som i nearest_stations.
+    """
+    lo = bisect_left(_LATS, min_lat)
+    hi = bisect_right(_LATS, max_lat)
+    return [
+        s for _, lon, s in _BY_LAT[lo:hi]
+        if min_lon <= lon <= max_lon and _has_param(s, param_id, since_year)
+    ]